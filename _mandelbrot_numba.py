@@ -0,0 +1,35 @@
+"""
+numba kernels for mandelbrot.get_escape_time_color_arr.
+These live in their own module so that importing mandelbrot does not import numba or
+compile anything; mandelbrot imports this module the first time the kernel is needed.
+"""
+from numba import guvectorize, njit
+
+@njit(cache=True)
+def escape_color(cr, ci, max_iterations):
+    """
+    Returns the color value of c = cr + ci*i using the same escape rule and
+    color formula as mandelbrot.get_escape_time_color_arr.
+    """
+    #points inside the main cardioid or the period-2 bulb never escape, skip the iteration
+    x = cr - 0.25
+    ci2 = ci * ci
+    q = x * x + ci2
+    if q * (q + x) < 0.25 * ci2 or (cr + 1) * (cr + 1) + ci2 < 0.0625:
+        return 0.0
+    zr = cr
+    zi = ci
+    for k in range(max_iterations + 1):
+        zr2 = zr * zr
+        zi2 = zi * zi
+        if zr2 + zi2 > 4.0:
+            return (max_iterations - k + 1) / (max_iterations + 1)
+        zi = (zr + zr) * zi + ci #zr + zr instead of 2.0 * zr so float32 input stays float32
+        zr = zr2 - zi2 + cr
+    return 0.0 #never escaped, colored black
+
+#numba's ufunc machinery broadcasts over the leading axes and spreads the rows over its thread pool
+@guvectorize(['void(complex64[:], int64, float64[:])', 'void(complex128[:], int64, float64[:])'], '(n),()->(n)', target='parallel', cache=True)
+def color_row(c, max_iterations, out):
+    for j in range(c.shape[0]):
+        out[j] = escape_color(c[j].real, c[j].imag, max_iterations)
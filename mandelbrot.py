@@ -1,5 +1,33 @@
+import concurrent.futures
+import ctypes
+import functools
+import os
+import warnings
+
 import numpy as np
 
+#numba and cupy are optional and are only imported the first time a kernel needs them,
+#see _numba_color_row and _cuda_kernels; without them the NumPy code path is used
+
+#the CuPy GPU backend is experimental and untested, so it is off unless USE_CUDA is set to True
+#(or the environment variable MANDELBROT_USE_CUDA is 1 when mandelbrot is imported)
+USE_CUDA = os.environ.get("MANDELBROT_USE_CUDA") == "1"
+
+#SIMD escape-time kernel from mandelbrot_kernel.c, used when it has been built next to this file
+try:
+    _kernel = ctypes.CDLL(os.path.join(os.path.dirname(os.path.abspath(__file__)), "_mandelbrot_kernel.so"))
+except OSError:
+    _kernel = None
+else:
+    _kernel.mandelbrot_escape.restype = None
+    _kernel.mandelbrot_escape.argtypes = [
+        np.ctypeslib.ndpointer(np.float64, flags="C_CONTIGUOUS"),
+        np.ctypeslib.ndpointer(np.float64, flags="C_CONTIGUOUS"),
+        np.ctypeslib.ndpointer(np.int32, flags="C_CONTIGUOUS"),
+        ctypes.c_size_t,
+        ctypes.c_int,
+    ]
+
 def get_escape_time(c: complex, max_iterations: int) -> int | None:
     """
     Calculates the number of iterations that have passed before
@@ -15,17 +43,18 @@ def get_escape_time(c: complex, max_iterations: int) -> int | None:
     """
     z = c
     for i in range(max_iterations):
-        if abs(z) > 2:
+        if z.real * z.real + z.imag * z.imag > 4.0: #same as abs(z) > 2 without the sqrt
             return i
         z = ((z)**2) + c
-    if abs(z) > 2:
+    if z.real * z.real + z.imag * z.imag > 4.0:
         return max_iterations
     return None
 
 def get_complex_grid(
     top_left: complex,
     bottom_right: complex,
-    step: float
+    step: float,
+    dtype: type = np.complex128
 ) -> np.ndarray:
     """
     Computes a numpy array of complex numbers that are evenly spaced between top_left and bottom_right
@@ -35,18 +64,78 @@ def get_complex_grid(
     :param top_left: Complex number for the top_left of the grid
     :param bottom_right: Complex number for the bottom_right of the grid
     :param step: Spacing between grid points
+    :param dtype: np.complex128, or np.complex64 to halve the memory traffic of every later step.
+    complex64 only has ~7 significant digits, so use complex128 for zooms past a scale of about 1e-5
     :return: A 2d numpy array of complex numbers
     """
 
     if bottom_right.real < top_left.real or bottom_right.imag > top_left.imag:
-        return np.array([])
+        return np.array([], dtype=dtype)
 
-    row1 = np.arange(top_left.real, bottom_right.real, step)
-    col1 = np.arange(top_left.imag, bottom_right.imag, -step)
-    col1 = col1.reshape(-1, 1)
-    ar = row1 + col1 * 1j
+    #bottom_right itself is not included, like np.arange
+    num_cols = _num_grid_points(bottom_right.real - top_left.real, step)
+    num_rows = _num_grid_points(top_left.imag - bottom_right.imag, step)
+    row1 = _grid_axis(top_left.real, top_left.real + (num_cols - 1) * step, num_cols)
+    col1 = _grid_axis(top_left.imag, top_left.imag - (num_rows - 1) * step, num_rows)
+
+    #writing the parts directly broadcasts them into place without building a col1 * 1j temporary
+    ar = np.empty((num_rows, num_cols), dtype=dtype)
+    ar.real = row1
+    ar.imag = col1.reshape(-1, 1)
     return ar
 
+def _grid_axis(start: float, stop: float, num: int) -> np.ndarray:
+    """
+    Returns num evenly spaced values from start to stop. When 0 falls on one of the values or
+    halfway between two of them, the values on either side of 0 are set to exactly the negatives
+    of their partners, e.g. 1.25, 1.24, ..., -1.24 has exactly symmetric values from 1.24 to -1.24,
+    so those rows' colors can be mirrored instead of computed twice.
+    """
+    values = np.linspace(start, stop, num)
+    if num < 2:
+        return values
+    #values[i] and values[pair_sum - i] are negatives of each other
+    pair_sum = -2 * start / (values[1] - values[0])
+    nearest = round(pair_sum)
+    if 0 < nearest < 2 * (num - 1) and np.isclose(pair_sum, nearest, rtol=1e-9, atol=1e-9):
+        low = np.arange(max(0, nearest - (num - 1)), (nearest + 1) // 2)
+        values[nearest - low] = -values[low]
+        if nearest % 2 == 0:
+            values[nearest // 2] = 0.0
+    return values
+
+def _num_grid_points(span: float, step: float) -> int:
+    """
+    Number of points start, start + step, ... that lie before start + span.
+    np.arange uses ceil(span / step), which gives one point too many whenever rounding puts
+    span / step just above a whole number (e.g. 1.1 / 0.1 == 11.000000000000002), so a ratio
+    within rounding error of a whole number is taken as that number.
+    """
+    ratio = span / step
+    nearest = round(ratio)
+    if np.isclose(ratio, nearest, rtol=1e-9, atol=0):
+        return max(int(nearest), 0)
+    return max(int(np.ceil(ratio)), 0)
+
+@functools.cache
+def _numba_color_row():
+    """
+    Returns the numba escape-time gufunc from _mandelbrot_numba, importing (and, the first
+    time ever, compiling) it on first use, or None when numba is not installed.
+    Any other import error, e.g. _mandelbrot_numba itself not being found, is raised.
+    """
+    try:
+        #_mandelbrot_numba sits next to this file, inside the package when mandelbrot is part of one
+        if __package__:
+            from ._mandelbrot_numba import color_row
+        else:
+            from _mandelbrot_numba import color_row
+    except ModuleNotFoundError as err:
+        if err.name != "numba":
+            raise
+        return None
+    return color_row
+
 def get_escape_time_color_arr(
     c_arr: np.ndarray,
     max_iterations: int
@@ -66,24 +155,392 @@ def get_escape_time_color_arr(
     
     """
     
-    escape_times_arr = np.zeros(c_arr.shape) #array of the escape times that is same shape as c_arr, but filled with zeroes initially
-    color_arr = np.zeros(c_arr.shape) #creates an array that has the calculated color values using their escape times
-    
-    for i in range(escape_times_arr.shape[0]): #iterates through each value in escape times array
-        for j in range(escape_times_arr.shape[1]):
-            escape_time = get_escape_time(c_arr[i, j], max_iterations) #calls on get_escape_time to get number of iterations
-            if escape_time is None:
-                escape_times_arr[i, j] = max_iterations + 1 #will calculate an escape time of zero using formula
-            else:
-                escape_times_arr[i, j] = escape_time #assigns escape time value to the max iterations value returned
-    
-    for i in range(escape_times_arr.shape[0]): #iterates through each value in escape times array
-        for j in range(escape_times_arr.shape[1]):
-            escape_time = escape_times_arr[i, j] #gets the escape time values from the escape_times_arr
-            color_arr[i, j] = (max_iterations - escape_time + 1) / (max_iterations + 1) #calculates the color value and adds it to the color array
-    
+    #the Mandelbrot set is symmetric about the real axis, so when a band of the grid's rows mirrors
+    #itself (row lo + i == conj(row hi - 1 - i) exactly) only the top half of that band is computed
+    block = _mirrored_block(c_arr, flip_columns=False) if c_arr.ndim == 2 else None
+    if block is None:
+        return _escape_time_color_arr_dispatch(c_arr, max_iterations)
+    rows, cols = block
+    mid = _mirrored_rows(rows).start
+    color_arr = np.empty(c_arr.shape)
+    color_arr[:mid] = _escape_time_color_arr_dispatch(c_arr[:mid], max_iterations)
+    if rows.stop < c_arr.shape[0]:
+        color_arr[rows.stop:] = _escape_time_color_arr_dispatch(c_arr[rows.stop:], max_iterations)
+    _mirror_block(color_arr, rows, cols, flip_columns=False)
+    return color_arr
+
+def _mirrored_block(grid: np.ndarray, flip_columns: bool) -> tuple[slice, slice] | None:
+    """
+    Finds the block grid[rows, cols] of a 2d grid that is exactly its own mirror image, returning
+    (rows, cols) or None when there is none of at least 2 rows.
+    Without flip_columns the mirror image is the block upside down and conjugated (symmetry about
+    the real axis) and cols is every column. With flip_columns it is the block rotated by 180
+    degrees and negated (symmetry about the origin).
+    """
+    if grid.ndim != 2 or grid.shape[0] < 2 or grid.shape[1] == 0:
+        return None
+    row_band = _mirrored_band(grid[:, 0].imag)
+    col_band = _mirrored_band(grid[0].real) if flip_columns else (0, grid.shape[1])
+    if row_band is None or col_band is None:
+        return None
+    rows, cols = slice(*row_band), slice(*col_band)
+    block = grid[rows, cols]
+    #only the top half has to be compared with the bottom half, the other half is the same test
+    half = block.shape[0] // 2
+    if flip_columns:
+        mirror = -block[::-1, ::-1][:half]
+    else:
+        mirror = np.conj(block[::-1][:half])
+    if not np.array_equal(block[:half], mirror):
+        return None
+    return rows, cols
+
+def _mirrored_band(values: np.ndarray) -> tuple[int, int] | None:
+    """
+    Finds the longest run values[lo:hi] that starts at the first value or ends at the last one and
+    is exactly its own negative reversed (values[lo + i] == -values[hi - 1 - i]), returning (lo, hi)
+    or None when there is no such run of at least 2 values.
+    """
+    n = values.size
+    candidates = [(0, int(j) + 1) for j in np.flatnonzero(values == -values[0])]
+    candidates += [(int(j), n) for j in np.flatnonzero(values == -values[-1])]
+    for lo, hi in sorted(candidates, key=lambda band: band[0] - band[1]):
+        if hi - lo >= 2 and np.array_equal(values[lo:hi], -values[lo:hi][::-1]):
+            return lo, hi
+    return None
+
+def _mirrored_rows(rows: slice) -> slice:
+    """
+    The rows of a mirrored block that are copied from the other half instead of computed.
+    """
+    return slice(rows.start + (rows.stop - rows.start + 1) // 2, rows.stop)
+
+def _mirror_block(colors: np.ndarray, rows: slice, cols: slice, flip_columns: bool):
+    """
+    Fills the bottom half of the block colors[rows, cols] from its top half, turned upside down
+    and, with flip_columns, also left to right.
+    """
+    bottom = _mirrored_rows(rows)
+    source = colors[rows.start:rows.start + bottom.stop - bottom.start, cols][::-1]
+    colors[bottom, cols] = source[:, ::-1] if flip_columns else source
+
+def _escape_time_color_arr_dispatch(c_arr: np.ndarray, max_iterations: int) -> np.ndarray:
+    """
+    Runs get_escape_time_color_arr on the fastest backend that is available.
+    """
+    if _use_cuda():
+        color_arr = _escape_colors_cupy(
+            c_arr.real, c_arr.imag, c_arr.real, c_arr.imag, 4.0, 0, max_iterations, max_iterations, skip_interior=True
+        )
+        if color_arr is not None:
+            return color_arr
+    #the C kernel only works in float64, so complex64 grids go to the numba float32 kernel when it exists
+    if _kernel is not None and c_arr.dtype != np.complex64:
+        return _escape_time_color_arr_kernel(c_arr, max_iterations)
+    color_row = _numba_color_row()
+    if color_row is not None:
+        #NumPy checks the float flags after the gufunc, so the cardioid test on |c| > 1e154 would warn
+        with np.errstate(over='ignore'):
+            return color_row(c_arr, max_iterations)
+    if _kernel is not None:
+        return _escape_time_color_arr_kernel(c_arr, max_iterations)
+    return _escape_time_color_arr_numpy(c_arr, max_iterations)
+
+def _escape_time_color_arr_kernel(c_arr: np.ndarray, max_iterations: int) -> np.ndarray:
+    """
+    Version of get_escape_time_color_arr that runs the escape loop in the compiled C kernel.
+    """
+    cre = np.ascontiguousarray(c_arr.real, dtype=np.float64).ravel()
+    cim = np.ascontiguousarray(c_arr.imag, dtype=np.float64).ravel()
+    escape_times_arr = np.empty(c_arr.shape, dtype=np.int32) #-1 for points that never escape
+    escape_times = escape_times_arr.reshape(-1)
+    num_threads = _num_threads()
+    if num_threads == 1 or cre.size < _TILE_SIZE:
+        _kernel.mandelbrot_escape(cre, cim, escape_times, cre.size, max_iterations)
+    else:
+        #ctypes releases the GIL during the call, so chunks run on all cores at once; there are a few
+        #chunks per thread because the rows near the set take much longer than the rest
+        chunk = -(-cre.size // (4 * num_threads))
+        pool = _kernel_pool()
+        chunks = [
+            pool.submit(_kernel.mandelbrot_escape, cre[start:start + chunk], cim[start:start + chunk],
+                        escape_times[start:start + chunk], min(chunk, cre.size - start), max_iterations)
+            for start in range(0, cre.size, chunk)
+        ]
+        for future in chunks:
+            future.result()
+
+    #(max_iterations - escape_time + 1) / (max_iterations + 1) without branching on the -1 entries:
+    #the subtraction only writes where the point escaped, everything else stays 0
+    color_arr = np.zeros(c_arr.shape)
+    np.subtract(max_iterations + 1, escape_times_arr, out=color_arr, where=escape_times_arr >= 0)
+    color_arr /= max_iterations + 1
+
     return color_arr
 
+def _num_threads() -> int:
+    """
+    Number of CPUs this process is allowed to run on, which can be fewer than the machine has.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+@functools.cache
+def _kernel_pool() -> concurrent.futures.ThreadPoolExecutor:
+    """
+    Thread pool that runs chunks of the grid through the C kernel, created on first use.
+    """
+    #one call on no points picks the kernel's SIMD version before several threads share it
+    empty = np.empty(0)
+    _kernel.mandelbrot_escape(empty, empty, np.empty(0, dtype=np.int32), 0, 0)
+    return concurrent.futures.ThreadPoolExecutor(_num_threads())
+
+#number of points iterated together by the NumPy code path, about 1 MB of float64 work arrays
+_TILE_SIZE = 128 * 128
+
+def _escape_time_color_arr_numpy(c_arr: np.ndarray, max_iterations: int) -> np.ndarray:
+    """
+    NumPy version of get_escape_time_color_arr, used when numba is not installed.
+    """
+    #real and imaginary parts are kept in separate flat float arrays so every step is a plain float ufunc
+    cre = c_arr.real.ravel()
+    cim = c_arr.imag.ravel()
+    #points inside the main cardioid or the period-2 bulb never escape and keep the color 0
+    outside = ~_in_cardioid_or_bulb(cre, cim)
+    cre = cre[outside]
+    cim = cim[outside]
+
+    color_arr = np.zeros(c_arr.size)
+    #z_0 = c for every point, and z_0 through z_max_iterations are checked, same as get_escape_time
+    color_arr[outside] = _escape_colors(cre.copy(), cim.copy(), cre, cim, 4.0, 0, max_iterations, max_iterations)
+
+    return color_arr.reshape(c_arr.shape)
+
+def _in_cardioid_or_bulb(cre: np.ndarray, cim: np.ndarray) -> np.ndarray:
+    """
+    Returns a boolean array that is True where c = cre + cim*i lies inside the main cardioid
+    or the period-2 bulb of the Mandelbrot set. Those points never escape, and they make up
+    most of the set, so they can be colored without iterating them.
+    """
+    #squares overflow for |c| above about 1e154; inf only fails the comparisons, and such a point
+    #is not interior anyway
+    with np.errstate(over='ignore'):
+        x = cre - 0.25
+        cim2 = cim * cim
+        q = x * x + cim2
+        in_cardioid = q * (q + x) < 0.25 * cim2
+        in_bulb = (cre + 1) * (cre + 1) + cim2 < 0.0625
+    return in_cardioid | in_bulb
+
+def _escape_colors(zr, zi, cre, cim, escape_threshold_sq, first_check, last_check, num_iterations, out=None):
+    """
+    Iterates z -> z^2 + c starting from z_0 = zr + zi*i and returns the color of every point.
+    A point whose first n in first_check..last_check with |z_n|^2 > escape_threshold_sq is n gets
+    (num_iterations - n + 1) / (num_iterations + 1), and a point that never escapes gets 0.
+    The color is written the moment a point escapes, so no escape-time array is built.
+
+    zr, zi are flat float arrays and are used as work space. cre, cim are either flat
+    arrays of the same length (one c per point) or scalars (a single c for every point).
+    The points are processed in tiles of _TILE_SIZE, and each tile is iterated to completion
+    before the next one starts, so its working arrays stay in cache instead of the whole grid
+    being streamed through memory on every iteration.
+    The colors are written into out (a flat float64 array) when it is given.
+    """
+    colors = np.empty(zr.shape) if out is None else out
+    per_point_c = np.ndim(cre) > 0
+    #scratch buffers are allocated once and shared by all tiles, a tile uses the first live entries
+    mag2_buf = np.empty(min(zr.size, _TILE_SIZE), dtype=zr.dtype)
+    escaped_buf = np.empty(mag2_buf.shape, dtype=bool)
+    for start in range(0, zr.size, _TILE_SIZE):
+        tile = slice(start, start + _TILE_SIZE)
+        _escape_colors_tile(
+            zr[tile], zi[tile],
+            cre[tile] if per_point_c else cre, cim[tile] if per_point_c else cim,
+            escape_threshold_sq, first_check, last_check, num_iterations,
+            colors[tile], mag2_buf, escaped_buf
+        )
+    return colors
+
+def _escape_colors_tile(zr, zi, cre, cim, escape_threshold_sq, first_check, last_check, num_iterations,
+                        colors, mag2_buf, escaped_buf):
+    """
+    Does the work of _escape_colors for a single tile, writing into colors.
+    Only the points that have not escaped yet are iterated: whenever some escape, they are
+    dropped from the live set, and the loop stops as soon as the live set is empty. Escaped
+    points are never squared again, so the loop cannot overflow or produce NaN.
+    Escaped points are scattered into colors rather than counted with an escape-count accumulator,
+    which measured slower.
+    """
+    colors[...] = 0 #points that never escape stay black
+    live_idx = np.arange(zr.size) #positions in colors of the points still being iterated
+    per_point_c = np.ndim(cre) > 0
+
+    if last_check < first_check: #no iteration to check, nothing can escape
+        return
+
+    #only the first squares and their sum can overflow, for a point with |z_0| > 1e154; inf compares
+    #as escaped, which is the right answer, and after that only points with |z|^2 <= threshold are squared
+    with np.errstate(over='ignore'):
+        zr2 = zr * zr
+        zi2 = zi * zi
+        mag2 = np.add(zr2, zi2, out=mag2_buf[:zr.size])
+
+    for i in range(last_check + 1):
+        n = live_idx.size
+        if n == 0: #every point has escaped, nothing left to iterate
+            break
+        if i > 0:
+            #z_i = z_(i-1)^2 + c, written out in real and imaginary parts
+            np.multiply(zr, zi, out=zi)
+            zi *= 2
+            zi += cim
+            np.subtract(zr2, zi2, out=zr)
+            zr += cre
+            np.multiply(zr, zr, out=zr2)
+            np.multiply(zi, zi, out=zi2)
+            mag2 = np.add(zr2, zi2, out=mag2_buf[:n])
+
+        escaped = np.greater(mag2, escape_threshold_sq, out=escaped_buf[:n])
+        if escaped.any():
+            #a point past the threshold before first_check is certain to still be past it at first_check
+            #(|z_(n+1)| >= |z_n|^2 - |c| > |z_n| once |z_n| > max(|c|, 2)), so it is recorded there
+            #right away instead of squaring it again, which keeps every value in the loop finite
+            escape_time = max(i, first_check)
+            colors[live_idx[escaped]] = (num_iterations - escape_time + 1) / (num_iterations + 1)
+            keep = ~escaped
+            live_idx = live_idx[keep]
+            zr = zr[keep]
+            zi = zi[keep]
+            zr2 = zr2[keep]
+            zi2 = zi2[keep]
+            if per_point_c:
+                cre = cre[keep]
+                cim = cim[keep]
+
+#CUDA version of _escape_colors, one thread per point; REAL is replaced by float or double
+_CUDA_ESCAPE_SOURCE = r'''
+extern "C" __global__
+void escape_color(const REAL* zr0, const REAL* zi0, const REAL* cre, const REAL* cim, const int c_step,
+                  const REAL escape_threshold_sq, const int first_check, const int last_check,
+                  const int num_iterations, const int skip_interior, double* out,
+                  const int height, const int width)
+{
+    const int col = blockIdx.x * blockDim.x + threadIdx.x;
+    const int row = blockIdx.y * blockDim.y + threadIdx.y;
+    if (row >= height || col >= width) return;
+    const int j = row * width + col;
+
+    REAL zr = zr0[j], zi = zi0[j];
+    const REAL cr = cre[j * c_step], ci = cim[j * c_step]; /* c_step is 0 when every point shares one c */
+    double color = 0.0;
+    if (skip_interior) {
+        /* Mandelbrot points inside the main cardioid or the period-2 bulb never escape */
+        const REAL x = cr - (REAL)0.25, ci2 = ci * ci;
+        const REAL q = x * x + ci2;
+        if (q * (q + x) < (REAL)0.25 * ci2 || (cr + 1) * (cr + 1) + ci2 < (REAL)0.0625) {
+            out[j] = color;
+            return;
+        }
+    }
+    for (int k = 0; k <= last_check && first_check <= last_check; k++) {
+        const REAL zr2 = zr * zr, zi2 = zi * zi;
+        if (zr2 + zi2 > escape_threshold_sq) {
+            const int n = k > first_check ? k : first_check;
+            color = (double)(num_iterations - n + 1) / (num_iterations + 1);
+            break;
+        }
+        zi = (zr + zr) * zi + ci;
+        zr = zr2 - zi2 + cr;
+    }
+    out[j] = color;
+}
+'''
+@functools.cache
+def _cuda_kernels():
+    """
+    Imports cupy on first use and returns the escape_color kernels by float dtype,
+    or None when cupy is not installed or there is no CUDA device.
+    RawKernel compiles on first launch, so nothing is built for a precision that is never used.
+    """
+    try:
+        import cupy
+    except ImportError:
+        return None
+    if not cupy.cuda.is_available():
+        return None
+    return {
+        np.dtype(np.float32): cupy.RawKernel(_CUDA_ESCAPE_SOURCE.replace("REAL", "float"), "escape_color"),
+        np.dtype(np.float64): cupy.RawKernel(_CUDA_ESCAPE_SOURCE.replace("REAL", "double"), "escape_color"),
+    }
+
+def _use_cuda() -> bool:
+    """
+    True when the CUDA backend has been turned on with USE_CUDA and cupy has a device to run on.
+    """
+    return USE_CUDA and _cuda_kernels() is not None
+
+@functools.cache
+def _cuda_errors() -> tuple:
+    """
+    The CuPy exceptions that mean the GPU cannot be used: the kernel failed to compile,
+    the launch failed, or the device ran out of memory.
+    """
+    import cupy
+    return (cupy.cuda.compiler.CompileException, cupy.cuda.nvrtc.NVRTCError, cupy.cuda.driver.CUDADriverError,
+            cupy.cuda.runtime.CUDARuntimeError, cupy.cuda.memory.OutOfMemoryError)
+
+def _stop_using_cuda(err: Exception):
+    """
+    Turns the CUDA backend off after it failed, so this and every later call runs on the CPU.
+    """
+    global USE_CUDA
+    USE_CUDA = False
+    warnings.warn(f"CUDA backend failed, falling back to the CPU: {err}", RuntimeWarning, stacklevel=3)
+
+def _escape_colors_cupy(zr, zi, cre, cim, escape_threshold_sq, first_check, last_check, num_iterations,
+                        skip_interior=False):
+    """
+    Same as _escape_colors, but runs on the GPU with CuPy and keeps the shape of zr.
+    Experimental and untested, only used when USE_CUDA is set.
+    With skip_interior, points c inside the Mandelbrot cardioid or period-2 bulb are colored 0
+    without iterating, as in _escape_time_color_arr_numpy.
+    zr, zi (and cre, cim when there is one c per point) can have any shape and can be NumPy
+    arrays or arrays already on the device; they are treated as rows of length zr.shape[-1]
+    and iterated in 16x16 thread blocks.
+    The precision of the grid is kept: complex64 grids run in float, complex128 in double.
+    Returns None, after turning USE_CUDA off, when the GPU fails.
+    """
+    colors = np.zeros(zr.shape)
+    if colors.size == 0:
+        return colors
+    import cupy #already imported by _cuda_kernels, this only binds the name
+
+    real = np.dtype(np.float32) if zr.dtype == np.float32 else np.dtype(np.float64)
+    per_point_c = np.ndim(cre) > 0
+
+    try:
+        #cupy.asarray leaves arrays that are already on the device where they are
+        d_zr = cupy.ascontiguousarray(cupy.asarray(zr), dtype=real)
+        d_zi = cupy.ascontiguousarray(cupy.asarray(zi), dtype=real)
+        d_cre = cupy.ascontiguousarray(cupy.asarray(cre), dtype=real).reshape(-1)
+        d_cim = cupy.ascontiguousarray(cupy.asarray(cim), dtype=real).reshape(-1)
+        d_colors = cupy.empty(colors.shape, dtype=cupy.float64)
+
+        width = colors.shape[-1]
+        height = colors.size // width
+        block = (16, 16)
+        blocks = ((width + block[0] - 1) // block[0], (height + block[1] - 1) // block[1])
+        _cuda_kernels()[real](blocks, block, (
+            d_zr, d_zi, d_cre, d_cim, np.int32(1 if per_point_c else 0),
+            real.type(escape_threshold_sq), np.int32(first_check), np.int32(last_check),
+            np.int32(num_iterations), np.int32(skip_interior), d_colors, np.int32(height), np.int32(width)
+        ))
+        return d_colors.get()
+    except _cuda_errors() as err:
+        _stop_using_cuda(err)
+        return None
+
 def get_julia_color_arr(grid: np.ndarray, c: complex, max_iter: int) -> np.ndarray:
     """
     Compute the escape times for the filled Julia set of the given complex number c.
@@ -96,26 +553,119 @@ def get_julia_color_arr(grid: np.ndarray, c: complex, max_iter: int) -> np.ndarr
     Returns:
         np.ndarray: 2D array representing escape times, used for coloring the Julia set.
     """
-    # Initialize escape times to zero
-    escape_data = np.zeros(grid.shape, dtype=int)
-
-    # Create a mutable copy of grid to perform iteration updates
-    z = np.copy(grid)
-    escape_threshold = max(np.abs(c), 2)
-    # NumPy's seterr suppresses warnings
-    with np.errstate(over='ignore', invalid='ignore'):
-        for i in range(1, max_iter):
-            # Perform Julia set iteration: z_n+1 = z_n^2 + c
-            z = z ** 2 + c
-
-            # magnitude > 2
-            escaped = np.abs(z) > escape_threshold
-
-            # Assign escape iteration
-            escape_data[escaped & (escape_data == 0)] = i
-            z[escaped] = 1
-    is_inside = escape_data == 0
-    escape_data[is_inside] = max_iter + 1
-    normalized_escape = (max_iter - escape_data + 1) / (max_iter + 1)
-
-    return normalized_escape
+    return JuliaRenderer(grid).render(c, max_iter)
+
+class JuliaRenderer:
+    """
+    Renders filled Julia sets on one fixed grid for any number of values of c, e.g. the frames
+    of an animation or an interactive viewer. The grid is split into flat real and imaginary
+    arrays once, and the work arrays are kept between frames, so each render only copies the
+    starting values back in instead of allocating a new set of buffers.
+
+    The orbits of z and -z are the same after one step, so when a block of the grid is symmetric
+    about the origin only its top half is iterated and its bottom half is the same picture rotated
+    by 180 degrees. When a band of rows is symmetric about the real axis and c is real, z and conj(z)
+    have conjugate orbits, and the band's bottom half is its top half mirrored.
+
+    Parameters:
+        grid (np.ndarray): array of complex numbers representing the complex plane.
+            Its precision is kept, so a complex64 grid renders in float32.
+    """
+
+    def __init__(self, grid: np.ndarray):
+        self.grid = grid
+        # Split grid into flat real and imaginary float arrays so each step is a plain float ufunc;
+        # the loop works in place, so integer grids are converted to float64 here (float32 stays float32)
+        real = np.dtype(np.float32) if grid.real.dtype == np.float32 else np.dtype(np.float64)
+        self._zr0 = np.asarray(grid.real, dtype=real).ravel().copy()
+        self._zi0 = np.asarray(grid.imag, dtype=real).ravel().copy()
+        self._zr = np.empty_like(self._zr0)
+        self._zi = np.empty_like(self._zi0)
+        # Real and imaginary parts on the GPU, uploaded by the first CUDA render and kept after that
+        self._device_grid = None
+        # The grid never changes, so its symmetries are found once here
+        self._point_half = self._half(_mirrored_block(grid, flip_columns=True), flip_columns=True)
+        self._conj_half = self._half(_mirrored_block(grid, flip_columns=False), flip_columns=False)
+
+    def _half(self, block: tuple[slice, slice] | None, flip_columns: bool) -> tuple | None:
+        """
+        Returns what render needs to compute only the points outside the mirrored half of block:
+        (rows, cols, flip_columns, mask of the computed points, their starting zr and zi, and a buffer
+        for their colors), or None when there is no block.
+        """
+        if block is None:
+            return None
+        rows, cols = block
+        computed = np.ones(self.grid.shape, dtype=bool)
+        computed[_mirrored_rows(rows), cols] = False
+        flat = computed.ravel()
+        zr0 = self._zr0[flat]
+        return rows, cols, flip_columns, computed, zr0, self._zi0[flat], np.empty(zr0.size)
+
+    def render(self, c: complex, max_iter: int, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Compute the colors of the filled Julia set of c, same as get_julia_color_arr.
+
+        Parameters:
+            c (complex): The constant c defining the Julia set.
+            max_iter (int): Maximum number of iterations before declaring a point inside the set.
+            out (np.ndarray, optional): C-contiguous float64 array with the grid's shape to write into.
+
+        Returns:
+            np.ndarray: array with the grid's shape holding the colors (out when it is given).
+
+        Raises:
+            ValueError: if out does not have the grid's shape, is not float64 or is not C-contiguous.
+        """
+        cre = c.real
+        cim = c.imag
+        # Compare squared magnitudes so the loop never takes a sqrt
+        escape_threshold_sq = max(cre * cre + cim * cim, 4.0)
+        if out is None:
+            out = np.empty(self.grid.shape)
+        elif out.shape != self.grid.shape or out.dtype != np.float64 or not out.flags.c_contiguous:
+            # The colors are written through flat views of out, which would silently be copies otherwise
+            raise ValueError(f"out must be a C-contiguous float64 array of shape {self.grid.shape}, "
+                             f"got a {'' if out.flags.c_contiguous else 'non-contiguous '}{out.dtype} array of shape {out.shape}")
+        # Escape is checked for z_1 through z_(max_iter - 1), points inside the set are colored 0
+        if _use_cuda():
+            if self._device_grid is None:
+                self._device_grid = self._upload_grid()
+            if self._device_grid is not None:
+                d_zr0, d_zi0 = self._device_grid
+                colors = _escape_colors_cupy(d_zr0, d_zi0, cre, cim, escape_threshold_sq, 1, max_iter - 1, max_iter)
+                if colors is not None:
+                    out[...] = colors
+                    return out
+
+        # For real c the band mirrored about the real axis is preferred, it covers every column
+        half = self._conj_half if cim == 0 and self._conj_half is not None else self._point_half
+        if half is None:
+            # The iteration works in place, so it gets a fresh copy of the starting values
+            np.copyto(self._zr, self._zr0)
+            np.copyto(self._zi, self._zi0)
+            _escape_colors(self._zr, self._zi, cre, cim, escape_threshold_sq, 1, max_iter - 1, max_iter,
+                           out=out.reshape(-1))
+            return out
+
+        # Only the points outside the mirrored half are iterated, then the half is copied over
+        rows, cols, flip_columns, computed, zr0, zi0, colors = half
+        n = zr0.size
+        np.copyto(self._zr[:n], zr0)
+        np.copyto(self._zi[:n], zi0)
+        out[computed] = _escape_colors(self._zr[:n], self._zi[:n], cre, cim, escape_threshold_sq,
+                                       1, max_iter - 1, max_iter, out=colors)
+        _mirror_block(out, rows, cols, flip_columns)
+        return out
+
+    def _upload_grid(self):
+        """
+        Copies the grid's real and imaginary parts to the GPU, or returns None when that fails.
+        """
+        import cupy
+        try:
+            return (cupy.asarray(self._zr0.reshape(self.grid.shape)),
+                    cupy.asarray(self._zi0.reshape(self.grid.shape)))
+        except _cuda_errors() as err:
+            _stop_using_cuda(err)
+            return None